@@ -1,17 +1,34 @@
 
 import argparse
+import base64
+import hashlib
 import io
+import json
 import os
 import re
+import shutil
+import subprocess
 import sys
 import time
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-import PyPDF2
-from openai import OpenAI
+from lxml.html.clean import Cleaner
+import pymupdf
+import tiktoken
+from openai import APIConnectionError, InternalServerError, OpenAI, RateLimitError
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+try:
+    import re2 as cue_re  # optional: linear-time matching for very long texts
+except ImportError:
+    cue_re = re
 
 # ----------------------------
 # Setup
@@ -27,6 +44,55 @@ HEADERS = {
     )
 }
 
+# Shared session so repeated fetches reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+# Drops clearly irrelevant elements from a job page in a single pass over the tree
+JOB_PAGE_CLEANER = Cleaner(
+    scripts=True,
+    javascript=True,
+    style=True,
+    embedded=True,
+    forms=True,
+    page_structure=False,
+    safe_attrs_only=False,
+    kill_tags=["img", "input", "nav", "footer", "header", "noscript", "svg", "button", "form"],
+)
+
+INVALID_INPUT_REPLY = (
+    "It looks like either the job posting URL/text or the CV content may be invalid or incomplete.\n\n"
+    "Please make sure you: \n"
+    "- Paste a real job posting URL (from a careers site or job board)\n"
+    "- Provide a proper CV PDF (not random text or a scan without selectable text)\n\n"
+    "Once both are valid, I can analyze the CV against the job description and draft a short cover letter."
+)
+
+NOT_A_FIT_REPLY = (
+    "Your CV and this job description have very little in common, so this role is unlikely to be a fit.\n\n"
+    "No cover letter was drafted. If you think this is wrong, re-run with `--min-similarity 0` to skip this check."
+)
+
+# Cue words for the CV / job description heuristics, matched case-insensitively anywhere in the text
+CV_CUES = cue_re.compile(
+    "(?i)" + "|".join(map(re.escape, ["experience", "education", "skills", "projects", "summary", "work", "certification"]))
+)
+JD_CUES = cue_re.compile(
+    "(?i)" + "|".join(map(re.escape, ["responsibilities", "requirements", "qualifications", "role", "about the role", "what you'll do"]))
+)
+
+# Transient API failures worth retrying (rate limits, 5xx, network/timeouts)
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+BACKOFF = wait_exponential_jitter(max=30)
+
+CACHE_DIR = Path("~/.cache/cv_coverletter").expanduser()
+PAGE_CACHE_DIR = CACHE_DIR / "pages"
+MAX_PAGE_BYTES = 2_000_000  # stop reading hostile or runaway pages past this size
+PAGE_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds
+MAX_CACHED_PAGES = 200
+
 SYSTEM_PROMPT = """
 You are an assistant who analyzes user's CV against the job description 
 and provide a short summary if the user is fit for this job. If the user is fit for the job, 
@@ -57,137 +123,509 @@ def is_probable_job_url(url: str) -> bool:
     return any(h in url.lower() for h in hints)
 
 
-def fetch_job_text(url: str, timeout: int = 25) -> Tuple[str, str]:
+def fetch_page(url: str, timeout: int = 25, session: requests.Session = SESSION, max_bytes: int = MAX_PAGE_BYTES):
+    """Fetch and parse a page, revalidating a recent cached copy with ETag/Last-Modified.
+
+    Mirrors fetch_page in Job_Search/job_search.py; the two tools are installed and run separately.
+    """
+    cache_path = PAGE_CACHE_DIR / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+    try:
+        fresh = time.time() - cache_path.stat().st_mtime < PAGE_CACHE_MAX_AGE
+        cached = json.loads(cache_path.read_text(encoding="utf-8")) if fresh else None
+    except (OSError, ValueError):
+        cached = None
+    conditional = {}
+    if cached:
+        conditional = {k: v for k, v in (("If-None-Match", cached.get("etag")),
+                                         ("If-Modified-Since", cached.get("last_modified"))) if v}
+
+    with session.get(url, headers=conditional, timeout=timeout, stream=True) as resp:
+        if resp.status_code == 304 and cached:
+            body, encoding = base64.b64decode(cached["body"]), cached.get("encoding")
+            # The server confirmed the copy; keep it fresh for the max-age check and eviction
+            try:
+                os.utime(cache_path)
+            except OSError:
+                pass
+        else:
+            resp.raise_for_status()
+            # Stop reading past max_bytes instead of loading runaway pages whole
+            buf = bytearray()
+            for chunk in resp.iter_content(65536):
+                buf.extend(chunk)
+                if len(buf) >= max_bytes:
+                    break
+            body = bytes(buf[:max_bytes])
+            # requests' text/* default (ISO-8859-1) is a guess; only use a declared charset
+            encoding = resp.encoding if "charset" in resp.headers.get("Content-Type", "").lower() else None
+            etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+            if etag or last_modified:
+                save_cached_page(cache_path, {"etag": etag, "last_modified": last_modified, "encoding": encoding,
+                                              "body": base64.b64encode(body).decode("ascii")})
+
+    parser = None
+    if encoding:
+        try:
+            parser = lxml.html.HTMLParser(encoding=encoding)
+        except LookupError:
+            pass
+    return lxml.html.document_fromstring(body, parser=parser)
+
+
+def save_cached_page(path: Path, entry: dict) -> None:
+    """Best-effort write of a page cache entry, evicting expired and least recently written entries."""
+    try:
+        PAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(entry), encoding="utf-8")
+        entries = sorted(PAGE_CACHE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for i, old in enumerate(entries):
+            if i >= MAX_CACHED_PAGES or time.time() - old.stat().st_mtime >= PAGE_CACHE_MAX_AGE:
+                old.unlink()
+    except OSError:
+        pass
+
+
+def fetch_job_text(url: str, timeout: int = 25, session: requests.Session = SESSION) -> Tuple[str, str]:
     """Return (title, text) from a job posting page."""
-    resp = requests.get(url, headers=HEADERS, timeout=timeout)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.content, "html.parser")
-    title = soup.title.string.strip() if soup.title and soup.title.string else "No title found"
+    root = fetch_page(url, timeout, session)
+    title = (root.findtext(".//title") or "").strip() or "No title found"
 
     # Remove clearly irrelevant elements
-    if soup.body:
-        for irrelevant in soup.body(["script", "style", "img", "input", "nav", "footer", "header"
-                                     , "noscript", "svg", "button", "form"]):
-            irrelevant.decompose()
-        text = soup.body.get_text(separator="\n", strip=True)
-    else:
-        text = soup.get_text(separator="\n", strip=True)
+    JOB_PAGE_CLEANER(root)
+    body = root.find("body")
+    node = body if body is not None else root
+    text = "\n".join(t.strip() for t in node.itertext() if t.strip())
 
     return title, text
 
 
-def extract_pdf_text(path: str) -> str:
-    """Extract text from a PDF file using PyPDF2."""
-    with open(path, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        chunks = []
-        for page in reader.pages:
+def extract_pdf_text(path: str, max_pages: int = 8) -> str:
+    """Extract text from the first `max_pages` pages of a PDF, preferring poppler's `pdftotext` over PyMuPDF."""
+    if shutil.which("pdftotext"):
+        try:
+            out = subprocess.run(
+                ["pdftotext", "-q", "-layout", "-l", str(max_pages), path, "-"],
+                capture_output=True,
+                check=True,
+            )
+            text = out.stdout.decode("utf-8", "ignore").strip()
+            if text:
+                return text
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            # fall back: parse in-process below
+            pass
+
+    buf = io.StringIO()
+    with pymupdf.open(path) as doc:
+        for i, page in enumerate(doc):
+            if i >= max_pages:
+                break
             try:
-                chunks.append(page.extract_text() or "")
+                buf.write(page.get_text("text") or "")
+                buf.write("\n")
             except Exception:
                 # fall back: ignore problematic page
                 pass
-    return "\n".join(chunks).strip()
+    return buf.getvalue().strip()
+
+
+def count_cues(pattern: Any, text: str, needed: int) -> int:
+    """Count distinct cues matched by `pattern` (a compiled `re` or `re2` pattern), stopping once `needed` are found."""
+    seen = set()
+    for m in pattern.finditer(text):
+        seen.add(m.group(0).lower())
+        if len(seen) >= needed:
+            break
+    return len(seen)
 
 
 def looks_like_cv(text: str) -> bool:
     """Heuristic check for CV-ish content."""
     if not text or len(text) < 500:  # very short unlikely to be a CV
         return False
-    cues = ["experience", "education", "skills", "projects", "summary", "work", "certification"]
-    count = sum(1 for c in cues if c in text.lower())
-    return count >= 2
+    return count_cues(CV_CUES, text, 2) >= 2
 
 
 def looks_like_job_description(text: str) -> bool:
     """Heuristic check for JD-ish content."""
     if not text or len(text) < 500:
         return False
-    cues = ["responsibilities", "requirements", "qualifications", "role", "about the role", "what you'll do"]
-    count = sum(1 for c in cues if c in text.lower())
-    return count >= 1
+    return count_cues(JD_CUES, text, 1) >= 1
+
+
+def cv_job_similarity(cv_text: str, job_text: str) -> float:
+    """Cosine similarity of the CV and job description under TF-IDF (0 = unrelated)."""
+    # imported here: scikit-learn takes ~1s to import and most runs never get this far
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(stop_words="english", max_features=5000)
+    try:
+        m = vectorizer.fit_transform([cv_text, job_text])
+    except ValueError:
+        # empty vocabulary, e.g. only stop words
+        return 0.0
+    # rows are L2-normalised, so the dot product is the cosine
+    return float((m[0] @ m[1].T).toarray()[0, 0])
+
+
+def truncate_tokens(text: str, model: str, max_tokens: int) -> str:
+    """Trim text to at most `max_tokens` tokens of the model's encoding."""
+    try:
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # encoding files unavailable (e.g. offline): approximate ~4 chars per token
+        return text[: max_tokens * 4]
+    ids = enc.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    return enc.decode(ids[:max_tokens])
 
 
 def build_user_prompt(job_text: str, cv_text: str, url: str) -> str:
+    # CV goes first: it is the part repeated across jobs, so it forms a cacheable prompt prefix
     return f"""
-Job Posting:
-{job_text}
-
 CV:
 {cv_text}
 
+Job Posting:
+{job_text}
+
 Url:
 {url}
 """
 
 
+def check_inputs(job_text: str, cv_text: str, min_similarity: float) -> Optional[str]:
+    """Return a canned reply if the pair should not be sent to the LLM, else None."""
+    # Heuristic validation (mirrors notebook logic/intent)
+    if not looks_like_job_description(job_text) or not looks_like_cv(cv_text):
+        return INVALID_INPUT_REPLY
+    # Cheap local check: obvious mismatches don't need an LLM call
+    if min_similarity > 0 and cv_job_similarity(cv_text, job_text) < min_similarity:
+        return NOT_A_FIT_REPLY
+    return None
+
+
+def build_messages(job_text: str, cv_text: str, url: str, args: argparse.Namespace) -> List[dict]:
+    """Build the chat messages for one CV/job pair, keeping both texts within their token budgets."""
+    job_text = truncate_tokens(job_text, args.model, args.max_job_tokens)
+    cv_text = truncate_tokens(cv_text, args.model, args.max_cv_tokens)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_prompt(job_text, cv_text, url)},
+    ]
+
+
+def response_cache_path(model: str, messages: List[dict]) -> Path:
+    """Return the on-disk cache location for a (model, messages) request."""
+    payload = json.dumps({"m": model, "msgs": messages}, sort_keys=True)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"{key}.md"
+
+
+@lru_cache(maxsize=None)
+def get_client() -> OpenAI:
+    """Return the process-wide OpenAI client so its connection pool is reused across calls."""
+    # retries are handled by create_completion
+    return OpenAI(max_retries=0)
+
+
+def wait_for_retry(retry_state) -> float:
+    """Honor the API's Retry-After header when present, else back off exponentially with jitter."""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(max(float(retry_after), 0.0), 60.0)
+    except (TypeError, ValueError):
+        return BACKOFF(retry_state)
+
+
+def call_with_retries(fn, *args, attempts: int = 5, **kwargs):
+    """Call an OpenAI client method, retrying transient failures."""
+    retrying = Retrying(
+        retry=retry_if_exception_type(RETRYABLE_ERRORS),
+        wait=wait_for_retry,
+        stop=stop_after_attempt(attempts),
+        reraise=True,
+    )
+    return retrying(fn, *args, **kwargs)
+
+
+def create_completion(client: OpenAI, model: str, messages: List[dict], attempts: int = 5, stream: bool = False):
+    """Call the chat completions API, retrying transient failures (only while opening a stream)."""
+    return call_with_retries(
+        client.chat.completions.create,
+        attempts=attempts,
+        model=model,
+        messages=messages,
+        temperature=0.2,
+        stream=stream,
+    )
+
+
+def batch_state_path(batch_id: str) -> Path:
+    """Return where the state needed to resume a submitted batch is kept."""
+    return CACHE_DIR / "batches" / f"{batch_id}.json"
+
+
+def run_batch(args: argparse.Namespace) -> None:
+    """Analyze the CV against every --job-url through the OpenAI Batch API and print the results."""
+    if args.batch_id:
+        try:
+            state = json.loads(batch_state_path(args.batch_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[error] No saved state for batch {args.batch_id}: {e}", file=sys.stderr)
+            sys.exit(2)
+        collect_batch(state, max(1, args.retries))
+        return
+
+    urls = args.job_url
+    for url in urls:
+        if not is_probable_job_url(url):
+            print(f"[notice] {url} doesn't look like a typical job posting. The assistant may decline to analyze.")
+
+    # Fetch all postings in the background while the CV is parsed
+    with ThreadPoolExecutor(max_workers=min(16, len(urls))) as ex:
+        job_futures = [ex.submit(fetch_job_text, url) for url in urls]
+        try:
+            cv_text = extract_pdf_text(args.cv)
+        except Exception as e:
+            print(f"[error] Failed to extract CV: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        results = {}
+        pending = {}
+        lines = []
+        for i, (url, future) in enumerate(zip(urls, job_futures)):
+            try:
+                _, job_text = future.result()
+            except Exception as e:
+                results[i] = f"[error] Failed to fetch job posting: {e}"
+                continue
+            # A cached answer means this pair already passed the input checks
+            messages = build_messages(job_text, cv_text, url, args)
+            cache_path = response_cache_path(args.model, messages)
+            if not args.no_cache and cache_path.exists():
+                results[i] = cache_path.read_text(encoding="utf-8")
+                continue
+            reply = check_inputs(job_text, cv_text, args.min_similarity)
+            if reply:
+                results[i] = reply
+                continue
+            custom_id = f"job-{i}"
+            pending[custom_id] = [i, str(cache_path)]
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": args.model, "messages": messages, "temperature": 0.2},
+            }))
+
+    if not lines:
+        print_batch_results(urls, results)
+        return
+
+    client = get_client()
+    attempts = max(1, args.retries)
+    # Upload from memory (not an open file) so a retried upload resends the whole payload
+    payload = ("requests.jsonl", ("\n".join(lines) + "\n").encode("utf-8"))
+    try:
+        input_file = call_with_retries(client.files.create, file=payload, purpose="batch", attempts=attempts)
+        batch = call_with_retries(
+            client.batches.create,
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            attempts=attempts,
+        )
+    except Exception as e:
+        print(f"[error] OpenAI API error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # Persist everything needed to collect the results, so an interrupted run can resume
+    state = {"batch_id": batch.id, "urls": urls, "results": results, "pending": pending}
+    batch_state_path(batch.id).parent.mkdir(parents=True, exist_ok=True)
+    batch_state_path(batch.id).write_text(json.dumps(state), encoding="utf-8")
+    print(f"[notice] Submitted batch {batch.id} with {len(lines)} request(s); waiting for it to finish...")
+    print(f"[notice] If interrupted, resume with: --batch-id {batch.id}")
+    collect_batch(state, attempts)
+
+
+def collect_batch(state: dict, attempts: int = 5) -> None:
+    """Wait for a submitted batch, then cache and print its per-job results."""
+    client = get_client()
+    batch_id = state["batch_id"]
+    urls = state["urls"]
+    # JSON object keys are strings; results are indexed by position in urls
+    results = {int(i): text for i, text in state["results"].items()}
+    pending = state["pending"]
+
+    try:
+        # Poll with exponential backoff; a batch may take up to its completion window
+        batch = call_with_retries(client.batches.retrieve, batch_id, attempts=attempts)
+        delay = 5
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(delay)
+            delay = min(delay * 2, 300)
+            batch = call_with_retries(client.batches.retrieve, batch_id, attempts=attempts)
+
+        if batch.status != "completed":
+            print(f"[error] Batch {batch_id} ended with status '{batch.status}'", file=sys.stderr)
+            sys.exit(1)
+        if not batch.output_file_id and not batch.error_file_id:
+            print(f"[error] Batch {batch_id} completed without an output or error file", file=sys.stderr)
+            sys.exit(1)
+        # Successful requests land in the output file, failed ones in the error file
+        records = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                text = call_with_retries(client.files.content, file_id, attempts=attempts).text
+                records.extend(json.loads(line) for line in text.splitlines() if line.strip())
+    except KeyboardInterrupt:
+        print(f"\n[notice] Stopped waiting; resume with: --batch-id {batch_id}", file=sys.stderr)
+        sys.exit(130)
+    except Exception as e:
+        print(f"[error] OpenAI API error: {e}", file=sys.stderr)
+        print(f"[notice] The batch is still on OpenAI's side; resume with: --batch-id {batch_id}", file=sys.stderr)
+        sys.exit(1)
+
+    for record in records:
+        i, cache_path = pending.get(record.get("custom_id"), (None, None))
+        if i is None:
+            continue
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            error = record.get("error") or body.get("error") or body
+            message = error.get("message", error) if isinstance(error, dict) else error
+            results[i] = f"[error] OpenAI API error: {message}"
+            continue
+        content = body["choices"][0]["message"]["content"]
+        results[i] = content
+        # Cache so a later single-job run for the same pair is instant
+        if content:
+            try:
+                Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+                Path(cache_path).write_text(content, encoding="utf-8")
+            except OSError as e:
+                print(f"[notice] Could not write response cache: {e}", file=sys.stderr)
+
+    print_batch_results(urls, results)
+    batch_state_path(batch_id).unlink(missing_ok=True)
+
+
+def print_batch_results(urls: List[str], results: dict) -> None:
+    """Print one Markdown section per job URL, in the order they were given."""
+    for i, url in enumerate(urls):
+        print(f"## {url}\n")
+        print(results.get(i, "[error] No result returned for this job posting."))
+        print()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Analyze CV vs Job Description and draft a cover letter if it's a fit.")
-    parser.add_argument("--job-url", required=True, help="URL of the job posting")
-    parser.add_argument("--cv", required=True, help="Path to CV PDF file")
+    parser.add_argument("--job-url", nargs="+", help="URL of the job posting (several are allowed with --batch)")
+    parser.add_argument("--cv", help="Path to CV PDF file")
     parser.add_argument("--model", default=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), help="OpenAI model to use (default: gpt-4o-mini)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses and call the API again")
+    parser.add_argument("--min-similarity", type=float, default=0.05, help="Skip the LLM when CV/job TF-IDF similarity is below this (default: 0.05, 0 disables)")
+    parser.add_argument("--max-job-tokens", type=int, default=3000, help="Token budget for the job posting text (default: 3000)")
+    parser.add_argument("--max-cv-tokens", type=int, default=4000, help="Token budget for the CV text (default: 4000)")
+    parser.add_argument("--retries", type=int, default=5, help="Attempts for transient OpenAI API failures (default: 5)")
+    parser.add_argument("--batch", action="store_true", help="Submit all job URLs through the OpenAI Batch API (half price, results within 24h)")
+    parser.add_argument("--batch-id", help="Resume waiting for a batch submitted by an earlier --batch run")
     args = parser.parse_args()
+    if not args.batch_id and (not args.job_url or not args.cv):
+        parser.error("--job-url and --cv are required unless resuming with --batch-id")
+    if args.job_url and len(args.job_url) > 1 and not args.batch:
+        parser.error("multiple --job-url values require --batch")
 
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         print("[error] OPENAI_API_KEY not set. Put it in a .env or environment.", file=sys.stderr)
         sys.exit(2)
 
-    # Validate inputs quickly
-    if not is_probable_job_url(args.job_url):
-        print("[notice] The provided URL doesn't look like a typical job posting. The assistant may decline to analyze.")
+    if args.batch_id:
+        run_batch(args)
+        return
+
     if not os.path.exists(args.cv):
         print(f"[error] CV file not found: {args.cv}", file=sys.stderr)
         sys.exit(2)
 
-    # Fetch and parse job description
-    try:
-        job_title, job_text = fetch_job_text(args.job_url)
-    except Exception as e:
-        print(f"[error] Failed to fetch job posting: {e}", file=sys.stderr)
-        sys.exit(1)
+    if args.batch:
+        run_batch(args)
+        return
 
-    # Extract CV text
-    try:
-        cv_text = extract_pdf_text(args.cv)
-    except Exception as e:
-        print(f"[error] Failed to extract CV: {e}", file=sys.stderr)
+    # Validate inputs quickly
+    job_url = args.job_url[0]
+    if not is_probable_job_url(job_url):
+        print("[notice] The provided URL doesn't look like a typical job posting. The assistant may decline to analyze.")
+
+    # Fetch the job posting in the background while the CV is parsed
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        job_future = ex.submit(fetch_job_text, job_url)
+
+        # Extract CV text
+        cv_error = None
+        try:
+            cv_text = extract_pdf_text(args.cv)
+        except Exception as e:
+            cv_error = e
+
+        # Fetch and parse job description
+        try:
+            job_title, job_text = job_future.result()
+        except Exception as e:
+            print(f"[error] Failed to fetch job posting: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if cv_error is not None:
+        print(f"[error] Failed to extract CV: {cv_error}", file=sys.stderr)
         sys.exit(1)
 
-    # Heuristic validation (mirrors notebook logic/intent)
-    if not looks_like_job_description(job_text) or not looks_like_cv(cv_text):
-        generic = (
-            "It looks like either the job posting URL/text or the CV content may be invalid or incomplete.\n\n"
-            "Please make sure you: \n"            "- Paste a real job posting URL (from a careers site or job board)\n"            "- Provide a proper CV PDF (not random text or a scan without selectable text)\n\n"
-            "Once both are valid, I can analyze the CV against the job description and draft a short cover letter."
-        )
-        print(generic)
+    # Build prompts
+    messages = build_messages(job_text, cv_text, job_url, args)
+
+    # Reuse a previous answer for the exact same request; it already passed the input checks
+    cache_path = response_cache_path(args.model, messages)
+    if not args.no_cache and cache_path.exists():
+        print(cache_path.read_text(encoding="utf-8"))
         sys.exit(0)
 
-    # Build prompts
-    user_prompt = build_user_prompt(job_text, cv_text, args.job_url)
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_prompt},
-    ]
+    reply = check_inputs(job_text, cv_text, args.min_similarity)
+    if reply:
+        print(reply)
+        sys.exit(0)
 
-    # OpenAI client
-    client = OpenAI()
+    client = get_client()
 
-    # Call API
+    # Call API and print the markdown response as it streams in
+    parts = []
     try:
-        resp = client.chat.completions.create(
-            model=args.model,
-            messages=messages,
-            temperature=0.2,
-        )
-        content = resp.choices[0].message.content
+        stream = create_completion(client, args.model, messages, attempts=max(1, args.retries), stream=True)
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                sys.stdout.write(delta)
+                sys.stdout.flush()
     except Exception as e:
-        print(f"[error] OpenAI API error: {e}", file=sys.stderr)
+        print(f"\n[error] OpenAI API error: {e}" if parts else f"[error] OpenAI API error: {e}", file=sys.stderr)
         sys.exit(1)
-
-    # Print markdown response
-    print(content)
+    print()
+    content = "".join(parts)
+
+    # Cache the complete answer for later re-runs
+    if content:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(content, encoding="utf-8")
+        except OSError as e:
+            print(f"[notice] Could not write response cache: {e}", file=sys.stderr)
 
 
 if __name__ == "__main__":
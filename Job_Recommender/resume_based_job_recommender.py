@@ -1,8 +1,16 @@
+from functools import lru_cache
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
 import pypdf
 
+
+@lru_cache(maxsize=None)
+def get_client():
+    """Returns the process-wide OpenAI client, created on first use so its connections are reused."""
+    return OpenAI()
+
+
 class ResumeBasedJobRecommendation:
     def __init__(self, path: str):
         self.resume_path = path
@@ -52,7 +60,7 @@ class ResumeBasedJobRecommendation:
                 "content": f"Below is my resume content, kindly look for the appropriate job openings in \
                 {job_sites} for location {location}:\n{data}"
             }]
-        self.response = openai.chat.completions.create(model='gpt-4o-mini', messages=self.message)
+        self.response = get_client().chat.completions.create(model='gpt-4o-mini', messages=self.message)
         return self.response.choices[0].message.content
 
 
@@ -74,8 +82,6 @@ if __name__ == '__main__':
     else:
         print("api key is found and it looks good.")
 
-    openai = OpenAI()
-
     #Provide the valid resume path
     file_path = input("Kindly enter the resume path:\n")
     if not file_path:
@@ -1,43 +1,202 @@
+import argparse
+import base64
+import hashlib
+import json
 import os
-from bs4 import BeautifulSoup
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlparse
 from openai import OpenAI
 from dotenv import load_dotenv
 load_dotenv()
+import lxml.etree
+import lxml.html
 import requests
+from lxml.cssselect import SelectorError
+from requests.adapters import HTTPAdapter
 
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
 }
 
+MAX_WORKERS = 16
+
+CACHE_DIR = Path("~/.cache/job_search").expanduser()
+PAGE_CACHE_DIR = CACHE_DIR / "pages"
+MAX_PAGE_BYTES = 2_000_000  # stop reading hostile or runaway pages past this size
+PAGE_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds
+MAX_CACHED_PAGES = 200
+SELECTOR_CACHE = CACHE_DIR / "selectors.json"
+MAX_SELECTOR_TEXT_RATIO = 0.5  # a learned selector must cut the page text at least in half
+
+MODEL = "gemma2-9b-it"
+
+# Shared session so repeated fetches reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.headers.update(headers)
+SESSION.mount("http://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS))
+SESSION.mount("https://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS))
+
+def fetch_page(url: str, timeout: int = 20, session: requests.Session = SESSION, max_bytes: int = MAX_PAGE_BYTES):
+    """Fetch and parse a page, revalidating a recent cached copy with ETag/Last-Modified.
+
+    Mirrors fetch_page in CV_Coverletter/cv_coverletter.py; the two tools are installed and run separately.
+    """
+    cache_path = PAGE_CACHE_DIR / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+    try:
+        fresh = time.time() - cache_path.stat().st_mtime < PAGE_CACHE_MAX_AGE
+        cached = json.loads(cache_path.read_text(encoding="utf-8")) if fresh else None
+    except (OSError, ValueError):
+        cached = None
+    conditional = {}
+    if cached:
+        conditional = {k: v for k, v in (("If-None-Match", cached.get("etag")),
+                                         ("If-Modified-Since", cached.get("last_modified"))) if v}
+
+    with session.get(url, headers=conditional, timeout=timeout, stream=True) as resp:
+        if resp.status_code == 304 and cached:
+            body, encoding = base64.b64decode(cached["body"]), cached.get("encoding")
+            # The server confirmed the copy; keep it fresh for the max-age check and eviction
+            try:
+                os.utime(cache_path)
+            except OSError:
+                pass
+        else:
+            resp.raise_for_status()
+            # Stop reading past max_bytes instead of loading runaway pages whole
+            buf = bytearray()
+            for chunk in resp.iter_content(65536):
+                buf.extend(chunk)
+                if len(buf) >= max_bytes:
+                    break
+            body = bytes(buf[:max_bytes])
+            # requests' text/* default (ISO-8859-1) is a guess; only use a declared charset
+            encoding = resp.encoding if "charset" in resp.headers.get("Content-Type", "").lower() else None
+            etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+            if etag or last_modified:
+                save_cached_page(cache_path, {"etag": etag, "last_modified": last_modified, "encoding": encoding,
+                                              "body": base64.b64encode(body).decode("ascii")})
+
+    parser = None
+    if encoding:
+        try:
+            parser = lxml.html.HTMLParser(encoding=encoding)
+        except LookupError:
+            pass
+    return lxml.html.document_fromstring(body, parser=parser)
+
+
+def save_cached_page(path: Path, entry: dict) -> None:
+    """Best-effort write of a page cache entry, evicting expired and least recently written entries."""
+    try:
+        PAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(entry), encoding="utf-8")
+        entries = sorted(PAGE_CACHE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for i, old in enumerate(entries):
+            if i >= MAX_CACHED_PAGES or time.time() - old.stat().st_mtime >= PAGE_CACHE_MAX_AGE:
+                old.unlink()
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_client() -> OpenAI:
+    """Return the process-wide Groq (OpenAI-compatible) client, created on first use."""
+    return OpenAI(
+        api_key=os.getenv("GROQ_API_KEY"),
+        base_url="https://api.groq.com/openai/v1",
+    )
+
+
+def load_selectors() -> dict:
+    """Return the cached hostname -> CSS selector mapping for job listings."""
+    try:
+        selectors = json.loads(SELECTOR_CACHE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return selectors if isinstance(selectors, dict) else {}
+
+
+def save_selectors(selectors: dict) -> None:
+    try:
+        SELECTOR_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        SELECTOR_CACHE.write_text(json.dumps(selectors, indent=2, sort_keys=True), encoding="utf-8")
+    except OSError as e:
+        print(f"[notice] Could not save selector cache: {e}")
+
+
+def select_text(root, selector: str) -> str:
+    """Return the text under the nodes matching `selector`, or "" if it matches nothing."""
+    try:
+        nodes = root.cssselect(selector)
+    except SelectorError:
+        return ""
+    # Keep only outermost matches so nested matches don't repeat the same text
+    matched = set(nodes)
+    nodes = [n for n in nodes if not any(a in matched for a in n.iterancestors())]
+    return " ".join(t.strip() for n in nodes for t in n.itertext() if t.strip()).lower()
+
+
+def strip_code_fence(content: str) -> str:
+    """Remove a surrounding Markdown code fence (with optional language tag) from a model reply."""
+    return re.sub(r"^\s*```[\w-]*\s*|\s*```\s*$", "", content or "")
+
+
+def ask_for_selector(client: OpenAI, root, max_chars: int = 30000) -> str:
+    """Ask the model once which CSS selector holds the job postings on this page."""
+    # root has already had scripts/styles stripped; the listing markup lives in <body>
+    body = root.find("body")
+    html = lxml.html.tostring(body if body is not None else root, encoding="unicode")[:max_chars]
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": "You are an expert at reading HTML. Reply with a single CSS selector and nothing else."},
+            {"role": "user", "content": f"Which CSS selector contains the job postings in this HTML?\n\n{html}"},
+        ],
+        temperature=0,
+    )
+    return strip_code_fence(response.choices[0].message.content).strip()
+
+
 class Website:
-    def __init__(self, url: str):
+    def __init__(self, url: str, session: requests.Session = SESSION, selectors: dict = None):
         self.url = url
+        self.host = urlparse(url).hostname or ""
+        self.root = None
         try:
-            
-            response = requests.get(self.url, headers=headers, timeout=20)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            self.title = soup.title.string if soup.title else "No title found"
-            self.text = soup.get_text(separator=" ").lower()
+            self.root = fetch_page(self.url, 20, session)
+            self.title = self.root.findtext(".//title") or "No title found"
+            # Drop non-visible text (JS, CSS) before any text is read from the tree
+            lxml.etree.strip_elements(self.root, "script", "style", "noscript", "template", with_tail=False)
+            # Known hosts: read only the job list instead of the whole page
+            selector = (selectors or {}).get(self.host)  # "" = no usable selector for this host
+            self.text = select_text(self.root, selector) if selector else ""
+            if not self.text:
+                body = self.root.find("body")
+                node = body if body is not None else self.root
+                self.text = " ".join(t.strip() for t in node.itertext() if t.strip()).lower()
         except Exception as e:
             self.title = "Error"
             self.text = f""
             print(f"[Website] Failed to fetch {self.url}: {e}")
 
-def main():
-    job_search = Website("https://www.google.com/about/careers/applications/jobs")
-    system_prompt = (
-        "You are a job search assistant who finds real-time DevOps-related job listings from "
-        "career pages, job boards, and developer platforms. Return results with job title, "
-        "company name, and a link to the listing. Focus on DevOps, SRE, Platform Engineering, "
-        "and CI/CD tooling roles."
-    )
+DEFAULT_URLS = ["https://www.google.com/about/careers/applications/jobs"]
+
+JOB_FIELDS = ["title", "company", "location", "experience", "skills", "remote"]
 
-    user_prompt = f"""
-Here is a list of job postings:
 
-{job_search.text}
+def build_user_prompt(sites: list) -> str:
+    sources = "\n---\n".join(
+        f"Source {i} (url={site.url}):\n{site.text}" for i, site in enumerate(sites, start=1)
+    )
+    return f"""
+Here are the job postings from {len(sites)} source(s):
+
+{sources}
 
 Please extract only the jobs that are clearly related to:
 - DevOps
@@ -54,26 +213,97 @@ For each DevOps-related job, return:
 - Years of Experience
 - Skill set required
 - (if available) Whether it's remote
+
+Reply with JSON only, no prose, as an array with one entry per source:
+[{{"source": 1, "jobs": [{{"title": "...", "company": "...", "location": "...", "experience": "...", "skills": "...", "remote": "..."}}]}}]
 """
 
+
+def parse_results(content: str) -> list:
+    """Parse the model's JSON reply, tolerating a surrounding Markdown code fence."""
+    results = json.loads(strip_code_fence(content))
+    if not isinstance(results, list):
+        raise ValueError("expected a JSON array")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract DevOps-related jobs from one or more careers pages.")
+    parser.add_argument("--urls", default=",".join(DEFAULT_URLS), help="Comma-separated careers page URLs")
+    args = parser.parse_args()
+
+    urls = [u.strip() for u in args.urls.split(",") if u.strip()]
+    if not urls:
+        parser.error("--urls must contain at least one URL")
+    selectors = load_selectors()
+    # Fetch all pages concurrently; map keeps results in the order of urls
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(urls))) as ex:
+        sites = list(ex.map(lambda u: Website(u, selectors=selectors), urls))
+
+    client = get_client()
+
+    # Learn the job-list selector for hosts we haven't seen before; a selector that
+    # matches nothing (or barely trims the page) is remembered as "" so the host isn't asked again
+    learned = False
+    for site in sites:
+        if site.root is None or not site.host or site.host in selectors:
+            continue
+        try:
+            selector = ask_for_selector(client, site.root)
+        except Exception as e:
+            print(f"[notice] Could not learn a selector for {site.host}: {e}")
+            continue
+        text = select_text(site.root, selector) if selector else ""
+        # site.text is still the full <body> text here; a selector that barely trims it isn't worth keeping
+        if len(text) > len(site.text) * MAX_SELECTOR_TEXT_RATIO:
+            text = ""
+        if text:
+            site.text = text
+        selectors[site.host] = selector if text else ""
+        learned = True
+    if learned:
+        save_selectors(selectors)
+
+    system_prompt = (
+        "You are a job search assistant who finds real-time DevOps-related job listings from "
+        "career pages, job boards, and developer platforms. Return results with job title, "
+        "company name, and a link to the listing. Focus on DevOps, SRE, Platform Engineering, "
+        "and CI/CD tooling roles."
+    )
+
     messages = [
         {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
+        {"role": "user", "content": build_user_prompt(sites)},
     ]
 
-    client = OpenAI(
-        api_key=os.getenv("GROQ_API_KEY"),
-        base_url="https://api.groq.com/openai/v1",
-    )
-
     response = client.chat.completions.create(
-        model="gemma2-9b-it",
+        model=MODEL,
         messages=messages,
         temperature=0.2,
     )
 
     content = response.choices[0].message.content
-    print(content)
+    try:
+        results = parse_results(content)
+    except ValueError as e:
+        print(f"[notice] Could not parse JSON reply ({e}); showing it as-is.")
+        print(content)
+        return
+
+    for entry in results:
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("source")
+        url = urls[index - 1] if isinstance(index, int) and 0 < index <= len(urls) else "unknown source"
+        print(f"## Source {index}: {url}")
+        jobs = entry.get("jobs")
+        jobs = [job for job in jobs if isinstance(job, dict)] if isinstance(jobs, list) else []
+        if not jobs:
+            print("- No matching jobs found")
+        for job in jobs:
+            details = ", ".join(f"{k}: {job[k]}" for k in JOB_FIELDS if job.get(k))
+            print(f"- {details}")
+        print()
 
 if __name__ == "__main__":
     main()